@@ -15,6 +15,8 @@ import traceback
 from dataclasses import dataclass
 from typing import Tuple, Dict, List, Optional, Any
 
+from ov_runtime import build_ov_config
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -28,6 +30,7 @@ class ModelConfig:
     model_id: str
     cache_dir: str = "./model_cache"
     max_context_length: int = 1024
+    max_new_tokens: int = 512
     sliding_window_size: int = 512
     batch_size: int = 2
     max_queue_size: int = 10
@@ -80,6 +83,7 @@ class OptimizedModelManager:
         try:
             from transformers import AutoTokenizer
             from optimum.intel.openvino import OVModelForCausalLM
+            from openvino import Core
             
             # Check available memory before loading
             if self._check_memory_pressure():
@@ -90,13 +94,18 @@ class OptimizedModelManager:
                 self.config.model_id,
                 cache_dir=self.config.cache_dir
             )
+            # Left padding keeps every prompt's end aligned when inputs are batched
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
             
             # Load with optimized settings
             self.model = OVModelForCausalLM.from_pretrained(
                 self.config.model_id,
                 cache_dir=self.config.cache_dir,
                 from_transformers=False,  # Use cached OpenVINO IR if available
-                compile=False  # Avoid recompilation if possible
+                compile=False,  # Avoid recompilation if possible
+                ov_config=build_ov_config("CPU", Core(), os.path.join(self.config.cache_dir, "ov_compiled"))
             )
             
             # Initialize model properties based on config
@@ -203,34 +212,42 @@ class OptimizedModelManager:
         retry_count = 0
         backoff_time = 1.0  # Initial backoff time in seconds
         
+        # Prepare full input including history and system prompt
+        full_input = input_text
+        if system_prompt:
+            full_input = f"{system_prompt}\n\n{full_input}"
+        
+        # Add conversation history if provided
+        if conversation_history:
+            history_text = "\n".join(conversation_history[-3:])  # Last 3 exchanges
+            full_input = f"{history_text}\n\n{full_input}"
+        
+        # Tokenize once; retries reuse the same input ids
+        try:
+            inputs = self.tokenizer(full_input, return_tensors="pt")
+        except Exception as e:
+            logger.error(f"Tokenization error: {e}")
+            return "Sorry, I encountered technical difficulties generating a response. Please try again.", time.time() - start_time
+        
+        # Decode length is bounded independently of the prompt, capped by the context window
+        max_new_tokens = max(min(self.config.max_new_tokens, self.config.max_context_length - inputs.input_ids.shape[1]), 1)
+        
         while retry_count <= max_retries:
             try:
                 # Check memory before generation
                 self._clean_memory()
                 
-                # Prepare full input including history and system prompt
-                full_input = input_text
-                if system_prompt:
-                    full_input = f"{system_prompt}\n\n{full_input}"
-                
-                # Add conversation history if provided
-                if conversation_history:
-                    history_text = "\n".join(conversation_history[-3:])  # Last 3 exchanges
-                    full_input = f"{history_text}\n\n{full_input}"
-                
-                # Tokenize input
-                inputs = self.tokenizer(full_input, return_tensors="pt")
-                
                 # Generate with lock to prevent concurrent access
                 with self.inference_lock:
                     outputs = self.model.generate(
                         **inputs,
-                        max_length=min(len(inputs.input_ids[0]) + 512, self.config.max_context_length),
-                        min_length=20,
+                        max_new_tokens=max_new_tokens,
+                        min_new_tokens=min(20, max_new_tokens),
                         do_sample=True,
                         temperature=0.7,
                         no_repeat_ngram_size=3,
-                        num_return_sequences=1
+                        num_return_sequences=1,
+                        pad_token_id=self.tokenizer.pad_token_id
                     )
                 
                 # Decode output
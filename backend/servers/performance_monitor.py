@@ -9,13 +9,14 @@ including memory usage, response times, cache performance, and system health.
 import time
 import json
 import requests
+from requests.adapters import HTTPAdapter
 import psutil
 import threading
 import signal
 import sys
 from datetime import datetime, timedelta
 from collections import deque, defaultdict
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import argparse
 
 class PerformanceMonitor:
@@ -31,10 +32,11 @@ class PerformanceMonitor:
     """
     
     def __init__(self, server_url: str = "http://localhost:8000", 
-                 monitoring_interval: int = 5):
+                 monitoring_interval: int = 5, pool_size: int = 10):
         self.server_url = server_url.rstrip('/')
         self.monitoring_interval = monitoring_interval
         self.running = False
+        self._stop_event = threading.Event()
         
         # Data storage
         self.metrics_history = deque(maxlen=1000)  # Keep last 1000 measurements
@@ -58,27 +60,48 @@ class PerformanceMonitor:
             'uptime_start': datetime.now()
         }
         
-        # Session for HTTP requests
+        # Keep-alive session for HTTP requests; the pool is sized for load test
+        # concurrency so connections are reused rather than re-opened
         self.session = requests.Session()
-        self.session.timeout = (2, 5)  # Connect, read timeouts
+        self.pool_size = 0
+        self._mount_pool(pool_size)
+        
+        # Connect, read timeouts (requests.Session has no session-wide timeout)
+        self.health_timeout = (2, 5)
+        self.chat_timeout = (2, 60)  # Generation can take tens of seconds
+    
+    def _mount_pool(self, pool_size: int):
+        """Mount a keep-alive adapter holding up to pool_size connections to the server."""
+        self.pool_size = max(pool_size, 1)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
     def start_monitoring(self):
         """Start the monitoring loop."""
         self.running = True
+        self._stop_event.clear()
         print(f"🚀 Starting performance monitoring for {self.server_url}")
         print(f"📊 Monitoring interval: {self.monitoring_interval} seconds")
         print("Press Ctrl+C to stop monitoring\n")
         
         try:
-            while self.running:
-                self.collect_metrics()
-                time.sleep(self.monitoring_interval)
+            self._run_loop()
         except KeyboardInterrupt:
             self.stop_monitoring()
     
+    def _run_loop(self):
+        """Collect metrics every interval until stopped."""
+        while self.running:
+            self.collect_metrics()
+            # Wakes immediately when stop_monitoring() is called
+            if self._stop_event.wait(self.monitoring_interval):
+                break
+    
     def stop_monitoring(self):
         """Stop monitoring and generate final report."""
         self.running = False
+        self._stop_event.set()
         print("\n🛑 Stopping performance monitoring...")
         self.generate_final_report()
     
@@ -116,7 +139,7 @@ class PerformanceMonitor:
     def get_server_metrics(self) -> Dict[str, Any]:
         """Get server-specific metrics from health endpoint."""
         try:
-            response = self.session.get(f"{self.server_url}/api/health")
+            response = self.session.get(f"{self.server_url}/api/health", timeout=self.health_timeout)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -136,7 +159,8 @@ class PerformanceMonitor:
                     "role": "student",
                     "subject": "General"
                 },
-                headers={'Content-Type': 'application/json'}
+                headers={'Content-Type': 'application/json'},
+                timeout=self.chat_timeout
             )
             response_time = (time.time() - start_time) * 1000  # Convert to ms
             
@@ -358,6 +382,10 @@ class PerformanceMonitor:
         """Run a simple load test against the server."""
         print(f"\n🧪 Running load test for {duration} seconds with {concurrent_requests} concurrent requests...")
         
+        # One pooled connection per worker; a smaller pool discards connections
+        if concurrent_requests > self.pool_size:
+            self._mount_pool(concurrent_requests)
+        
         start_time = time.time()
         results = []
         
@@ -371,7 +399,8 @@ class PerformanceMonitor:
                         "question": f"Load test question at {datetime.now().isoformat()}",
                         "role": "student",
                         "subject": "General"
-                    }
+                    },
+                    timeout=self.chat_timeout
                 )
                 elapsed = time.time() - start
                 results.append({
@@ -387,18 +416,22 @@ class PerformanceMonitor:
                     'timestamp': time.time()
                 })
         
-        # Run concurrent requests
+        deadline = start_time + duration
+        
+        def worker():
+            """Issue requests back to back until the deadline."""
+            while time.time() < deadline:
+                make_request()
+        
+        # Each worker keeps exactly one request in flight, so the offered load
+        # stays at `concurrent_requests` without lockstep batches or pauses
         import concurrent.futures
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=concurrent_requests) as executor:
-            while time.time() - start_time < duration:
-                # Submit batch of requests
-                futures = [executor.submit(make_request) for _ in range(concurrent_requests)]
-                
-                # Wait for completion
-                concurrent.futures.wait(futures, timeout=10)
-                
-                time.sleep(0.1)  # Brief pause between batches
+            for _ in range(concurrent_requests):
+                executor.submit(worker)
+        
+        elapsed_total = time.time() - start_time
         
         # Analyze results
         if results:
@@ -414,11 +447,11 @@ class PerformanceMonitor:
                 print(f"   Avg Response Time: {sum(response_times)/len(response_times)*1000:.1f}ms")
                 print(f"   Min Response Time: {min(response_times)*1000:.1f}ms")
                 print(f"   Max Response Time: {max(response_times)*1000:.1f}ms")
-                print(f"   Requests/Second: {len(successful)/duration:.1f}")
+                print(f"   Requests/Second: {len(successful)/elapsed_total:.1f}")
 
 
-def main():
-    """Main function with command line argument parsing."""
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(description='Performance Monitor for Intel Classroom Assistant')
     parser.add_argument('--url', default='http://localhost:8000', 
                        help='Server URL (default: http://localhost:8000)')
@@ -430,10 +463,17 @@ def main():
                        help='Load test duration in seconds (default: 60)')
     parser.add_argument('--concurrent', type=int, default=5,
                        help='Concurrent requests for load test (default: 5)')
+    return parser
+
+# Built once at import
+_PARSER = _build_parser()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function with command line argument parsing."""
+    args = _PARSER.parse_args(argv)
     
-    args = parser.parse_args()
-    
-    monitor = PerformanceMonitor(args.url, args.interval)
+    monitor = PerformanceMonitor(args.url, args.interval, pool_size=args.concurrent)
     
     # Set up signal handler for graceful shutdown
     def signal_handler(signum, frame):
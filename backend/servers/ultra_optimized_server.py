@@ -21,28 +21,34 @@ import threading
 import traceback
 import queue
 import json
+import re
 import hashlib
+import itertools
 import signal
 import atexit
 import warnings
 
 # Suppress warnings early
 os.environ['TRANSFORMERS_VERBOSITY'] = 'error'
+# Prompts are tokenized one small batch at a time; keep the Rust tokenizer
+# from spinning up its own thread pool next to OpenVINO's inference threads
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
 warnings.filterwarnings("ignore", message="The following generation flags are not valid")
 warnings.filterwarnings("ignore", message=".*dynamic_shapes.*")
 warnings.filterwarnings("ignore", category=UserWarning)
 
 from datetime import datetime, timedelta
+from decimal import Decimal
 from functools import lru_cache, wraps
-from typing import Dict, Optional, Tuple, Any, List
+from typing import Dict, Optional, Tuple, Any, List, Union
 import weakref
+from collections import deque, OrderedDict
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, Future
-from dataclasses import dataclass
-from enum import Enum
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import psutil
 import requests
@@ -50,12 +56,22 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import numpy as np
 
+from ov_runtime import build_ov_config
+from request_batching import BatchedRequest, IntelligentBatchProcessor, RequestPriority
+
 # Optimization settings
 CACHE_TIMEOUT = 300  # 5 minutes cache for subject content
 REQUEST_POOL_SIZE = 20  # Increased connection pool size
 MAX_WORKERS = 8  # Increased thread pool size
 BATCH_SIZE = 4  # Process multiple requests in batches
+OV_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ov_cache')  # Compiled model cache
+OV_DEVICE = os.environ.get("OV_DEVICE", "")  # Force an OpenVINO device (e.g. CPU, GPU); empty = auto
 BATCH_TIMEOUT = 0.15  # Wait 150ms before processing incomplete batch (150%)
+INFERENCE_TIMEOUT = 45.0  # Seconds a chat request waits for its batch result
+BATCH_LATENCY_ESTIMATE = 20.0  # Rough CPU time for one full batch of long answers
+# Only queue what can finish before INFERENCE_TIMEOUT (about two batches deep);
+# anything beyond that is rejected up front instead of timing out
+MAX_QUEUED_REQUESTS = BATCH_SIZE * max(1, int(INFERENCE_TIMEOUT // BATCH_LATENCY_ESTIMATE))
 
 # Memory management settings
 MEMORY_CLEANUP_THRESHOLD = 80  # Cleanup when memory usage exceeds 80%
@@ -63,23 +79,8 @@ CRITICAL_MEMORY_THRESHOLD = 90  # Emergency cleanup threshold
 GC_FREQUENCY = 25  # Run garbage collection more frequently
 MODEL_CACHE_SIZE = 2  # Keep up to 2 models in memory
 
-# Request prioritization
-class RequestPriority(Enum):
-    LOW = 1
-    NORMAL = 2
-    HIGH = 3
-    CRITICAL = 4
-
-@dataclass
-class BatchedRequest:
-    """Represents a request in the batch processing queue."""
-    request_id: str
-    input_text: str
-    role: str
-    priority: RequestPriority
-    future: Future
-    timestamp: float
-    timeout: float = 45.0  # Increased from 30.0 to 45.0 (150%)
+# Process-wide request id sequence (unique even for concurrent requests)
+_request_counter = itertools.count(1)
 
 class AdvancedMemoryManager:
     """Advanced memory management with predictive cleanup and optimization."""
@@ -89,36 +90,52 @@ class AdvancedMemoryManager:
         self.cleanup_callbacks = []
         self.warning_threshold = 75
         self.critical_threshold = 85
+        self.sample_interval = 1.0  # Seconds a memory sample is reused for
+        self._last_sample_time = 0.0
+        self._last_stats = None
+        self._lock = threading.Lock()
         
     def register_cleanup_callback(self, callback):
         """Register a function to call during memory cleanup."""
         self.cleanup_callbacks.append(callback)
         
     def monitor_memory(self) -> Dict[str, Any]:
-        """Monitor memory usage and trigger cleanup if needed."""
-        memory = psutil.virtual_memory()
-        current_percent = memory.percent
-        
-        now = time.time()
-        self.memory_history.append((now, current_percent))
-        
-        cutoff = now - 60
-        self.memory_history = [(t, p) for t, p in self.memory_history if t > cutoff]
+        """
+        Monitor memory usage and trigger cleanup if needed.
         
-        stats = {
-            "current_percent": current_percent,
-            "available_mb": memory.available / (1024 * 1024),
-            "trend": self._calculate_trend(),
-            "cleanup_triggered": False
-        }
+        Memory is sampled at most once per sample_interval; calls in between
+        (every chat and health request) reuse the last stats without
+        touching psutil or re-running cleanup.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_stats is not None and now - self._last_sample_time < self.sample_interval:
+                return self._last_stats
+            
+            memory = psutil.virtual_memory()
+            current_percent = memory.percent
+            
+            self.memory_history.append((now, current_percent))
+            
+            cutoff = now - 60
+            self.memory_history = [(t, p) for t, p in self.memory_history if t > cutoff]
+            
+            stats = {
+                "current_percent": current_percent,
+                "available_mb": memory.available / (1024 * 1024),
+                "trend": self._calculate_trend(),
+                "cleanup_triggered": False
+            }
+            self._last_sample_time = now
+            self._last_stats = stats  # Shared with later callers; never mutated once published
         
-        # Trigger cleanup based on thresholds
+        # Trigger cleanup based on thresholds; only the sampling call reports it
         if current_percent > self.critical_threshold:
             self._emergency_cleanup()
-            stats["cleanup_triggered"] = True
-        elif current_percent > self.warning_threshold:
+            return {**stats, "cleanup_triggered": True}
+        if current_percent > self.warning_threshold:
             self._gentle_cleanup()
-            stats["cleanup_triggered"] = True
+            return {**stats, "cleanup_triggered": True}
             
         return stats
     
@@ -161,122 +178,13 @@ class AdvancedMemoryManager:
 
 memory_manager = AdvancedMemoryManager()
 
-class IntelligentBatchProcessor:
-    """
-    Intelligent batch processing system that groups similar requests
-    for more efficient model inference.
-    """
-    
-    def __init__(self, batch_size: int = BATCH_SIZE, timeout: float = BATCH_TIMEOUT):
-        self.batch_size = batch_size
-        self.timeout = timeout
-        self.queue = queue.PriorityQueue()
-        self.processing = False
-        self.processor_thread = None
-        self.stats = {
-            "batches_processed": 0,
-            "total_requests": 0,
-            "avg_batch_size": 0
-        }
-        
-    def submit_request(self, request: BatchedRequest) -> Future:
-        """Submit a request for batch processing."""
-        priority_value = 5 - request.priority.value  # Higher priority = lower number
-        self.queue.put((priority_value, request.timestamp, request))
-        
-        if not self.processing:
-            self._start_processor()
-            
-        return request.future
-    
-    def _start_processor(self):
-        """Start the batch processor thread."""
-        if self.processor_thread and self.processor_thread.is_alive():
-            return
-            
-        self.processing = True
-        self.processor_thread = threading.Thread(target=self._process_batches, daemon=True)
-        self.processor_thread.start()
-    
-    def _process_batches(self):
-        """Main batch processing loop."""
-        while self.processing:
-            try:
-                batch = self._collect_batch()
-                if batch:
-                    self._process_batch(batch)
-                else:
-                    time.sleep(0.01)  # Brief pause if no requests
-            except Exception as e:
-                logger.error(f"Error in batch processing: {e}")
-    
-    def _collect_batch(self) -> List[BatchedRequest]:
-        """Collect a batch of requests to process together."""
-        batch = []
-        deadline = time.time() + (self.timeout * 1.5)  # 150% of original timeout
-        
-        while len(batch) < self.batch_size and time.time() < deadline:
-            try:
-                _, _, request = self.queue.get(timeout=0.015)  # Increased from 0.01 to 0.015
-                if not request.future.cancelled():
-                    batch.append(request)
-                self.queue.task_done()
-            except queue.Empty:
-                if batch:  # If we have some requests, process them
-                    break
-                continue
-        
-        return batch
-    
-    def _process_batch(self, batch: List[BatchedRequest]):
-        """Process a batch of requests efficiently."""
-        if not batch:
-            return
-            
-        try:
-            role_groups = {}
-            for req in batch:
-                role = req.role
-                if role not in role_groups:
-                    role_groups[role] = []
-                role_groups[role].append(req)
-            
-            # Process each role group
-            for role, requests in role_groups.items():
-                self._process_role_group(role, requests)
-                
-            # Update statistics
-            self.stats["batches_processed"] += 1
-            self.stats["total_requests"] += len(batch)
-            self.stats["avg_batch_size"] = self.stats["total_requests"] / self.stats["batches_processed"]
-            
-        except Exception as e:
-            logger.error(f"Error processing batch: {e}")
-            # Mark all requests as failed
-            for req in batch:
-                if not req.future.done():
-                    req.future.set_exception(e)
-    
-    def _process_role_group(self, role: str, requests: List[BatchedRequest]):
-        """Process a group of requests with the same role."""
-        for request in requests:
-            if request.future.cancelled():
-                continue
-                
-            try:
-                result = self._process_single_request(request)
-                request.future.set_result(result)
-            except Exception as e:
-                request.future.set_exception(e)
-    
-    def _process_single_request(self, request: BatchedRequest) -> str:
-        """Process a single request through the model."""
-        # This will be implemented to use the actual model
-        # For now, return a placeholder
-        return f"Processed: {request.input_text[:50]}..."
-
 # Global batch processor
-batch_processor = IntelligentBatchProcessor()
+batch_processor = IntelligentBatchProcessor(
+    lambda input_texts, role: model_manager.generate_batch(input_texts, role),  # model_manager is created below
+    batch_size=BATCH_SIZE,
+    timeout=BATCH_TIMEOUT,
+    max_queued=MAX_QUEUED_REQUESTS
+)
 
 # Enhanced HTTP session with advanced retry logic
 def create_ultra_optimized_session() -> requests.Session:
@@ -323,8 +231,8 @@ class BalancedLogFilter(logging.Filter):
     
     def __init__(self):
         super().__init__()
-        self.last_messages = {}
-        self.message_counts = {}
+        self.message_counts = OrderedDict()  # LRU of message prefixes
+        self.max_tracked = 512
         self.max_duplicates = 3
         self.reset_interval = 300  # 5 minutes
         self.last_reset = time.time()
@@ -344,14 +252,17 @@ class BalancedLogFilter(logging.Filter):
         
         # Simple duplicate detection for INFO messages
         message_key = message[:100]  # First 100 chars
+        counts = self.message_counts
         
-        if message_key in self.message_counts:
-            self.message_counts[message_key] += 1
-            # Allow first few occurrences, then throttle
-            if self.message_counts[message_key] > self.max_duplicates:
-                return self.message_counts[message_key] % 10 == 0  # Every 10th message
-        else:
-            self.message_counts[message_key] = 1
+        count = counts.get(message_key, 0) + 1
+        counts[message_key] = count
+        counts.move_to_end(message_key)
+        if len(counts) > self.max_tracked:
+            counts.popitem(last=False)  # Evict least recently seen
+        
+        # Allow first few occurrences, then throttle
+        if count > self.max_duplicates:
+            return count % 10 == 0  # Every 10th message
         
         return True
 
@@ -388,12 +299,21 @@ chat_handler.setFormatter(logging.Formatter(
 ))
 chat_handler.setLevel(logging.INFO)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, handlers=[console_handler, file_handler])
+def start_queued_logging(*handlers):
+    """Route records through an in-memory queue; a listener thread does the actual I/O."""
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return QueueHandler(log_queue)
+
+# Configure logging - request threads only enqueue records, disk and
+# console writes happen on the listener threads
+logging.basicConfig(level=logging.INFO, handlers=[start_queued_logging(console_handler, file_handler)])
 
 # Create chat logger
 chat_logger = logging.getLogger('chat')
-chat_logger.addHandler(chat_handler)
+chat_logger.addHandler(start_queued_logging(chat_handler))
 chat_logger.setLevel(logging.INFO)
 chat_logger.propagate = False  # Don't duplicate to root logger
 
@@ -401,6 +321,11 @@ chat_logger.propagate = False  # Don't duplicate to root logger
 for lib in ['werkzeug', 'urllib3', 'transformers', 'optimum', 'requests']:
     logging.getLogger(lib).setLevel(logging.WARNING)
 
+# No format string uses thread or process fields; skip collecting them for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 # Suppress transformer warnings
 import warnings
 warnings.filterwarnings("ignore", message="The following generation flags are not valid")
@@ -417,16 +342,62 @@ def log_chat_activity(user_info, question_length, response_length, processing_ti
 
 # Import ML dependencies with error handling
 try:
-    from transformers import AutoTokenizer
+    import torch
+    from transformers import AutoTokenizer, TextIteratorStreamer, StoppingCriteriaList
     from optimum.intel.openvino import OVModelForCausalLM
+    from openvino import Core
     ML_AVAILABLE = True
     logger.info("ML dependencies loaded")
 except ImportError as e:
     logger.warning(f"ML dependencies not available: {e}")
     ML_AVAILABLE = False
 
+# Production WSGI server (optional)
+try:
+    from waitress import serve as waitress_serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+# Fast JSON serialization (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    json_loads = orjson.loads
+except ImportError:
+    ORJSON_AVAILABLE = False
+    json_loads = json.loads
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, so jsonify and get_json skip pure-Python json."""
+
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC if ORJSON_AVAILABLE else 0
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, Decimal):
+            return str(obj)
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self._default, option=self.option).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self._default, option=self.option),
+            mimetype=self.mimetype,
+        )
+
 # Initialize Flask with ultra optimizations
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 
 # Ultra Flask optimization settings
 app.config.update(
@@ -444,18 +415,36 @@ CORS(app, resources={
         "methods": ["GET", "POST", "OPTIONS"],
         "allow_headers": ["Content-Type", "x-access-token", "X-User-Role", "X-User-Email"],
         "max_age": 86400,  # Cache preflight for 24 hours
-        "supports_credentials": False  # Disable for performance
+        "supports_credentials": False,  # Disable for performance
+        "send_wildcard": True  # Static "*" instead of echoing each Origin, so responses stay cacheable
     }
 })
 
+def json_response(payload: Dict[str, Any], status: int = 200):
+    """Build a JSON response through the app's JSON provider (orjson when available)."""
+    return jsonify(payload), status
+
+def sse_event(payload: Dict[str, Any]) -> str:
+    """Format a payload as a Server-Sent Events data frame."""
+    return f"data: {app.json.dumps(payload)}\n\n"
+
 # Ultra thread pool for concurrent operations
 executor = ThreadPoolExecutor(
     max_workers=MAX_WORKERS,
     thread_name_prefix="UltraAI_Worker"
 )
 
-# Register memory manager cleanup
-memory_manager.register_cleanup_callback(lambda: gc.collect())
+# Streamed generation runs here; one recycled worker since inference is
+# serialised anyway
+inference_pool = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix="UltraAI_Stream"
+)
+
+# Each open stream holds a server thread until its generation finishes; cap
+# them below the thread count so /api/chat and /api/health always get a thread
+MAX_ACTIVE_STREAMS = max(1, min(MAX_QUEUED_REQUESTS, MAX_WORKERS // 2))
+stream_slots = threading.BoundedSemaphore(MAX_ACTIVE_STREAMS)
 
 # Enhanced caching system with Redis-like features
 class UltraAdvancedCache:
@@ -469,9 +458,10 @@ class UltraAdvancedCache:
     """
     
     def __init__(self, max_size: int = 1000, ttl: int = CACHE_TIMEOUT):
-        self.cache = {}
+        self.cache = OrderedDict()  # Ordered by last access, oldest first
         self.access_times = {}
         self.hit_counts = {}
+        self.entry_sizes = {}
         self.max_size = max_size
         self.ttl = ttl
         self._lock = threading.RLock()
@@ -489,13 +479,15 @@ class UltraAdvancedCache:
                 return None
             
             # Check TTL
-            if time.time() - self.access_times[key] > self.ttl:
+            now = time.time()
+            if now - self.access_times[key] > self.ttl:
                 self._remove_key(key)
                 self.stats["misses"] += 1
                 return None
             
             # Update access info
-            self.access_times[key] = time.time()
+            self.access_times[key] = now
+            self.cache.move_to_end(key)
             self.hit_counts[key] = self.hit_counts.get(key, 0) + 1
             self.stats["hits"] += 1
             
@@ -504,9 +496,10 @@ class UltraAdvancedCache:
     def set(self, key: str, value: Any, ttl: Optional[int] = None):
         with self._lock:
             effective_ttl = ttl or self.ttl
+            now = time.time()
             
             # Cleanup expired entries
-            self._cleanup_expired()
+            self._cleanup_expired(now)
             
             # Make room if needed
             if len(self.cache) >= self.max_size and key not in self.cache:
@@ -515,13 +508,15 @@ class UltraAdvancedCache:
             # Compress large values
             compressed_value = self._compress_if_needed(value)
             
-            # Store the value
+            # Store the value (re-inserted so it moves to the recent end)
+            hits = self.hit_counts.get(key, 0)
+            self._remove_key(key)
             self.cache[key] = compressed_value
-            self.access_times[key] = time.time()
-            self.hit_counts[key] = self.hit_counts.get(key, 0)
+            self.access_times[key] = now
+            self.hit_counts[key] = hits
             
             # Update memory usage stats
-            self._update_memory_usage()
+            self._track_memory_usage(key, compressed_value)
     
     def _compress_if_needed(self, value: Any) -> Any:
         """Compress large string values to save memory."""
@@ -548,39 +543,32 @@ class UltraAdvancedCache:
             del self.access_times[key]
         if key in self.hit_counts:
             del self.hit_counts[key]
-    
-    def _cleanup_expired(self):
-        """Remove expired entries."""
-        current_time = time.time()
-        expired_keys = [
-            key for key, access_time in self.access_times.items()
-            if current_time - access_time > self.ttl
-        ]
-        for key in expired_keys:
-            self._remove_key(key)
+        if key in self.entry_sizes:
+            self.stats["memory_usage"] -= self.entry_sizes.pop(key)
+    
+    def _cleanup_expired(self, now: float):
+        """Remove expired entries; they are always at the old end of the cache."""
+        while self.cache:
+            oldest_key = next(iter(self.cache))
+            if now - self.access_times[oldest_key] <= self.ttl:
+                break
+            self._remove_key(oldest_key)
             self.stats["evictions"] += 1
     
     def _evict_lru(self):
         """Evict least recently used item."""
-        if not self.access_times:
+        if not self.cache:
             return
         
-        # Find LRU item considering both access time and hit count
-        lru_key = min(
-            self.access_times.keys(),
-            key=lambda k: (self.access_times[k], self.hit_counts.get(k, 0))
-        )
+        lru_key = next(iter(self.cache))
         self._remove_key(lru_key)
         self.stats["evictions"] += 1
     
-    def _update_memory_usage(self):
-        """Update memory usage statistics."""
-        import sys
-        total_size = sum(
-            sys.getsizeof(v) + sys.getsizeof(k) 
-            for k, v in self.cache.items()
-        )
-        self.stats["memory_usage"] = total_size
+    def _track_memory_usage(self, key: str, stored_value: Any):
+        """Account for a newly stored entry in the memory usage statistics."""
+        size = sys.getsizeof(stored_value) + sys.getsizeof(key)
+        self.entry_sizes[key] = size
+        self.stats["memory_usage"] += size
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
@@ -600,10 +588,12 @@ class UltraAdvancedCache:
     def clear(self):
         """Clear all cache data."""
         with self._lock:
+            self.stats["evictions"] += len(self.cache)
             self.cache.clear()
             self.access_times.clear()
             self.hit_counts.clear()
-            self.stats["evictions"] += len(self.cache)
+            self.entry_sizes.clear()
+            self.stats["memory_usage"] = 0
     
     def warm_cache(self, warm_data: Dict[str, Any]):
         """Pre-populate cache with commonly used data."""
@@ -618,12 +608,14 @@ content_cache = UltraAdvancedCache()
 memory_manager.register_cleanup_callback(lambda: content_cache.clear())
 
 # Ultra-optimized conversation state management
+MAX_SESSION_MESSAGES = 30  # Hard cap per session; adaptive truncation usually keeps fewer
+
 class UltraConversationState:
     """Ultra-optimized conversation state with advanced memory management."""
     
     def __init__(self, max_age_hours: int = 24, max_conversations: int = 1000):
         self.conversations = {}
-        self.last_access = {}
+        self.last_access = OrderedDict()  # Least recently used session first
         self.conversation_stats = {}
         self.max_age = max_age_hours * 3600
         self.max_conversations = max_conversations
@@ -637,23 +629,23 @@ class UltraConversationState:
         """Get conversation history with automatic cleanup."""
         with self._lock:
             self._cleanup_if_needed()
-            self.last_access[session_id] = time.time()
+            self._touch(session_id, time.time())
             
             if session_id not in self.conversations:
-                self.conversations[session_id] = []
+                self.conversations[session_id] = deque(maxlen=MAX_SESSION_MESSAGES)
                 self.conversation_stats[session_id] = {
                     "created": time.time(),
                     "message_count": 0,
                     "total_chars": 0
                 }
             
-            return self.conversations[session_id].copy()  # Return copy for safety
+            return list(self.conversations[session_id])  # Return copy for safety
     
     def add_exchange(self, session_id: str, user_input: str, ai_response: str):
         """Add conversation exchange with intelligent truncation."""
         with self._lock:
             if session_id not in self.conversations:
-                self.conversations[session_id] = []
+                self.conversations[session_id] = deque(maxlen=MAX_SESSION_MESSAGES)
                 self.conversation_stats[session_id] = {
                     "created": time.time(),
                     "message_count": 0,
@@ -668,7 +660,7 @@ class UltraConversationState:
             ]
             
             self.conversations[session_id].extend(new_messages)
-            self.last_access[session_id] = timestamp
+            self._touch(session_id, timestamp)
             
             # Update stats
             stats = self.conversation_stats[session_id]
@@ -697,13 +689,18 @@ class UltraConversationState:
         if len(conversation) > max_messages:
             # Keep recent messages and preserve conversation flow
             keep_count = max_messages - 2  # Leave room for context
-            conversation = conversation[-keep_count:]
-            self.conversations[session_id] = conversation
+            for _ in range(len(conversation) - keep_count):
+                conversation.popleft()
             
             # Update stats
             stats["total_chars"] = sum(len(msg["content"]) for msg in conversation)
             stats["message_count"] = len(conversation)
     
+    def _touch(self, session_id: str, timestamp: float):
+        """Record an access, keeping last_access ordered from least to most recent."""
+        self.last_access[session_id] = timestamp
+        self.last_access.move_to_end(session_id)
+    
     def _cleanup_if_needed(self):
         """Cleanup old conversations if needed."""
         current_time = time.time()
@@ -712,28 +709,19 @@ class UltraConversationState:
         if len(self.conversations) < self.max_conversations * 0.8:
             return
         
-        # Find conversations to remove
-        to_remove = []
-        for session_id, last_time in self.last_access.items():
-            age = current_time - last_time
-            if age > self.max_age:
-                to_remove.append(session_id)
-        
-        # Remove oldest conversations if still over limit
-        if len(self.conversations) - len(to_remove) > self.max_conversations:
-            sorted_by_access = sorted(
-                self.last_access.items(),
-                key=lambda x: x[1]
-            )
-            additional_remove = len(self.conversations) - len(to_remove) - self.max_conversations
-            to_remove.extend([sid for sid, _ in sorted_by_access[:additional_remove]])
-        
-        # Perform removal
-        for session_id in to_remove:
+        # Expired and over-limit sessions are all at the old end, so stop at
+        # the first session that is young enough to keep
+        removed = 0
+        while self.last_access:
+            session_id, last_time = next(iter(self.last_access.items()))
+            if (current_time - last_time <= self.max_age
+                    and len(self.conversations) <= self.max_conversations):
+                break
             self._remove_conversation(session_id)
+            removed += 1
         
-        if to_remove:
-            logger.info(f"Cleaned up {len(to_remove)} conversations")
+        if removed:
+            logger.info(f"Cleaned up {removed} conversations")
     
     def _remove_conversation(self, session_id: str):
         """Remove a conversation and all associated data."""
@@ -783,9 +771,14 @@ class UltraModelManager:
     def __init__(self):
         self.models = {}
         self.tokenizers = {}
+        self.prefix_ids = {}  # model_id -> {role: system prompt token ids (1-D int64 array)}
         self.model_stats = {}
+        self.warm_models = set()  # model_ids whose background warm-up has finished
+        self.warmup_failed = set()  # model_ids whose background warm-up raised
         self.optimization_enabled = True
         self._lock = threading.RLock()
+        # Serializes model.generate only; tokenization and decoding run outside it
+        self._inference_lock = threading.Lock()
         
     def load_model(self, model_id: str = "OpenVINO/phi-2-int4-ov"):
         """Load model with ultra optimizations."""
@@ -819,13 +812,21 @@ class UltraModelManager:
                 )
                 if tokenizer.pad_token is None:
                     tokenizer.pad_token = tokenizer.eos_token
+                if not tokenizer.is_fast:
+                    # The slow Python tokenizer holds the GIL and stalls request threads
+                    logger.warning(f"No fast tokenizer available for {model_id}; tokenization will hold the GIL")
 
                 # Load model with advanced optimizations
+                core = Core()
+                device = self._select_device(core)
+                logger.info(f"Compiling model for OpenVINO device: {device}")
                 model = OVModelForCausalLM.from_pretrained(
                     model_id,
+                    device=device,
                     compile=True,
                     dynamic_shapes=True,  # Enable dynamic shapes for better performance
-                    trust_remote_code=True
+                    trust_remote_code=True,
+                    ov_config=build_ov_config(device, core, OV_CACHE_DIR)
                 )
                 
                 # Restore logging
@@ -834,10 +835,12 @@ class UltraModelManager:
                 # Store models
                 self.models[model_id] = model
                 self.tokenizers[model_id] = tokenizer
+                self.prefix_ids[model_id] = self._tokenize_role_prefixes(tokenizer)
                 
                 # Initialize stats
                 load_time = time.time() - start_time
                 self.model_stats[model_id] = {
+                    "device": device,
                     "load_time": load_time,
                     "inference_count": 0,
                     "total_inference_time": 0,
@@ -847,8 +850,14 @@ class UltraModelManager:
                 
                 logger.info(f"Model loaded successfully in {load_time:.2f}s")
                 
-                # Warm up the model
-                self._warmup_model(model_id)
+                # Warm up in the background so startup (and health probes) are not
+                # held up; requests arriving first simply run cold
+                threading.Thread(
+                    target=self._warmup_model,
+                    args=(model_id,),
+                    name="UltraAI_Warmup",
+                    daemon=True
+                ).start()
                 
                 return True
                 
@@ -856,6 +865,24 @@ class UltraModelManager:
                 logger.error(f"Failed to load model {model_id}: {e}")
                 return False
     
+    def _select_device(self, core) -> str:
+        """Pick the OpenVINO device: OV_DEVICE if set, else an Intel GPU when present, else CPU."""
+        if OV_DEVICE:
+            return OV_DEVICE
+        try:
+            if any(device.startswith("GPU") for device in core.available_devices):
+                return "GPU"
+        except Exception as e:
+            logger.debug(f"Could not enumerate OpenVINO devices: {e}")
+        return "CPU"
+    
+    def _tokenize_role_prefixes(self, tokenizer) -> Dict[str, Any]:
+        """Tokenize the static system prompt prefix of each role once."""
+        return {
+            role: tokenizer(prefix, return_tensors="np", add_special_tokens=True).input_ids[0].astype(np.int64)
+            for role, prefix in ROLE_PROMPT_PREFIXES.items()
+        }
+    
     def _warmup_model(self, model_id: str):
         """Warm up the model with sample inputs."""
         try:
@@ -871,7 +898,7 @@ class UltraModelManager:
             logger.info("Warming up model...")
             for text in warmup_texts:
                 inputs = tokenizer(text, return_tensors="pt")
-                with self._lock:
+                with self._inference_lock:
                     _ = model.generate(
                         **inputs,
                         max_length=inputs.input_ids.shape[1] + 5,
@@ -879,13 +906,112 @@ class UltraModelManager:
                         pad_token_id=tokenizer.eos_token_id
                     )
             
+            self.warm_models.add(model_id)
             logger.info("Model warmup completed")
             
         except Exception as e:
+            self.warmup_failed.add(model_id)
             logger.warning(f"Model warmup failed: {e}")
     
     def generate_response(self, input_text: str, role: str = "student", model_id: str = None) -> str:
-        """Generate response with ultra optimizations."""
+        """
+        Generate response with ultra optimizations.
+        
+        The role's system prompt is prepended from pre-tokenized ids, so
+        input_text should contain only the per-request part of the prompt.
+        """
+        return self.generate_batch([input_text], role, model_id)[0]
+    
+    def generate_batch(self, input_texts: List[str], role: str = "student", model_id: str = None) -> List[str]:
+        """
+        Generate responses for several same-role inputs in one model.generate call.
+        
+        Each input is appended to the role's pre-tokenized system prompt and
+        the batch is left-padded to a common length. Only the generated
+        continuation is decoded and returned, never the prompt.
+        """
+        model, tokenizer, stats, prefix_ids = self._resolve_model(role, model_id)
+        start_time = time.time()
+        
+        try:
+            input_ids, attention_mask = self._build_inputs(tokenizer, prefix_ids, input_texts)
+            
+            with self._inference_lock:
+                outputs = model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    **self._generation_kwargs(tokenizer)
+                )
+            
+            # Decode only the new tokens; left padding aligns every prompt end
+            responses = tokenizer.batch_decode(
+                outputs[:, input_ids.shape[1]:], skip_special_tokens=True
+            )
+            self._record_inference(stats, len(input_texts), time.time() - start_time)
+            return responses
+            
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            raise
+    
+    def stream_response(self, input_text: str, role: str = "student", model_id: str = None):
+        """
+        Yield generated text chunks as the model produces them.
+        
+        Generation runs on the inference pool holding the inference lock;
+        only newly generated text is yielded, never the prompt. Closing the
+        generator early stops a running generation at the next token, or
+        skips one still waiting for the lock. The server only notices a
+        client disconnect when it writes, i.e. after a token has been yielded.
+        Raises TimeoutError if no text arrives within INFERENCE_TIMEOUT.
+        """
+        model, tokenizer, stats, prefix_ids = self._resolve_model(role, model_id)
+        start_time = time.time()
+        
+        input_ids, attention_mask = self._build_inputs(tokenizer, prefix_ids, [input_text])
+        streamer = TextIteratorStreamer(
+            tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=INFERENCE_TIMEOUT
+        )
+        cancelled = threading.Event()
+        
+        def run_generation():
+            try:
+                with self._inference_lock:
+                    if cancelled.is_set():
+                        streamer.end()
+                        return
+                    model.generate(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([
+                            lambda input_ids, scores, **kwargs: cancelled.is_set()
+                        ]),
+                        **self._generation_kwargs(tokenizer)
+                    )
+            except Exception as e:
+                logger.error(f"Error during streamed inference: {e}")
+                streamer.end()  # Unblock the consumer
+                raise
+        
+        future = inference_pool.submit(run_generation)
+        
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        except queue.Empty:
+            # Stuck behind earlier generations (or stalled); give the thread back
+            raise TimeoutError(f"No tokens generated within {INFERENCE_TIMEOUT:.0f}s")
+        finally:
+            cancelled.set()
+            future.cancel()  # No-op once generation has started
+        
+        future.result()  # Re-raise a generation error in the consumer
+        self._record_inference(stats, 1, time.time() - start_time)
+    
+    def _resolve_model(self, role: str, model_id: Optional[str]):
+        """Return (model, tokenizer, stats, role prefix ids) for an inference call."""
         if not model_id:
             model_id = list(self.models.keys())[0] if self.models else None
         
@@ -893,50 +1019,61 @@ class UltraModelManager:
             raise RuntimeError("No model available for inference")
         
         with self._lock:
-            model = self.models[model_id]
-            tokenizer = self.tokenizers[model_id]
-            stats = self.model_stats[model_id]
-            
-            start_time = time.time()
-            
-            try:
-                # Tokenize input
-                inputs = tokenizer(
-                    input_text,
-                    return_tensors="pt",
-                    truncation=True,
-                    max_length=1500,  # Prevent excessive memory usage
-                    padding=True
-                )
-                
-                # Generate with OpenVINO-compatible parameters (remove problematic ones)
-                outputs = model.generate(
-                    **inputs,
-                    max_new_tokens=512,  # Limit response length
-                    min_new_tokens=10,
-                    do_sample=False,  # Use deterministic generation for OpenVINO compatibility
-                    repetition_penalty=1.1,
-                    no_repeat_ngram_size=3,
-                    pad_token_id=tokenizer.eos_token_id,
-                    eos_token_id=tokenizer.eos_token_id
-                    # Removed: temperature, top_p, early_stopping (not supported by OpenVINO)
-                )
-                
-                # Decode response
-                response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-                
-                # Update stats
-                inference_time = time.time() - start_time
-                stats["inference_count"] += 1
-                stats["total_inference_time"] += inference_time
-                stats["avg_inference_time"] = stats["total_inference_time"] / stats["inference_count"]
-                stats["last_used"] = time.time()
-                
-                return response
-                
-            except Exception as e:
-                logger.error(f"Error during model inference: {e}")
-                raise
+            role_prefixes = self.prefix_ids[model_id]
+            return (
+                self.models[model_id],
+                self.tokenizers[model_id],
+                self.model_stats[model_id],
+                role_prefixes.get(role, role_prefixes["student"])
+            )
+    
+    def _build_inputs(self, tokenizer, prefix_ids, input_texts: List[str]):
+        """
+        Tokenize per-request suffixes and left-pad them behind the cached prefix.
+        
+        The batch is assembled in numpy (token id lists are written straight
+        into one preallocated buffer) and handed to torch without a copy.
+        """
+        prefix_len = len(prefix_ids)
+        suffix_ids = tokenizer(
+            input_texts,
+            truncation=True,
+            max_length=max(1500 - prefix_len, 64),  # Prevent excessive memory usage
+            add_special_tokens=False
+        ).input_ids
+        
+        # Left-pad so every sequence ends where generation starts
+        max_len = prefix_len + max(len(ids) for ids in suffix_ids)
+        input_ids = np.full((len(input_texts), max_len), tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros_like(input_ids)
+        for row, ids in enumerate(suffix_ids):
+            offset = max_len - prefix_len - len(ids)
+            input_ids[row, offset:offset + prefix_len] = prefix_ids
+            input_ids[row, offset + prefix_len:] = ids
+            attention_mask[row, offset:] = 1
+        
+        return torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+    
+    def _generation_kwargs(self, tokenizer) -> Dict[str, Any]:
+        """Generation parameters shared by batched and streamed inference."""
+        # OpenVINO-compatible parameters (temperature, top_p, early_stopping are not supported)
+        return {
+            "max_new_tokens": 512,  # Limit response length
+            "min_new_tokens": 10,
+            "do_sample": False,  # Use deterministic generation for OpenVINO compatibility
+            "repetition_penalty": 1.1,
+            "no_repeat_ngram_size": 3,
+            "pad_token_id": tokenizer.eos_token_id,
+            "eos_token_id": tokenizer.eos_token_id
+        }
+    
+    def _record_inference(self, stats: Dict[str, Any], count: int, inference_time: float):
+        """Update inference statistics for a model."""
+        with self._lock:
+            stats["inference_count"] += count
+            stats["total_inference_time"] += inference_time
+            stats["avg_inference_time"] = stats["total_inference_time"] / stats["inference_count"]
+            stats["last_used"] = time.time()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get model statistics."""
@@ -1006,23 +1143,15 @@ Guidelines:
 - Focus on subject accuracy, teaching strategy, and classroom applicability
 - Keep the answers under 2048 characters"""
 
-# Cache system prompts
-@lru_cache(maxsize=2)
-def get_system_prompt(role: str) -> str:
-    """Get cached system prompt for role."""
-    if role == "teacher":
-        return TEACHER_SYSTEM_PROMPT
-    return STUDENT_SYSTEM_PROMPT
-
-# Dynamic context with caching
-@lru_cache(maxsize=1)
-def get_current_dynamic_context() -> str:
-    """Get cached dynamic context."""
-    now = datetime.now()
-    return f"""
-Current date: {now.strftime('%Y-%m-%d')}
-Current time: {now.strftime('%H:%M:%S')}
-Current semester: Fall Term
+# Fused "{prompt}\n\n" prefix per role, built once at import and tokenized once per model
+ROLE_PROMPT_PREFIXES = {
+    "student": f"{STUDENT_SYSTEM_PROMPT}\n\n",
+    "teacher": f"{TEACHER_SYSTEM_PROMPT}\n\n",
+}
+VALID_ROLES = frozenset(ROLE_PROMPT_PREFIXES)
+
+# Static tail of the dynamic context; only the date/time head is re-rendered
+DYNAMIC_CONTEXT_GUIDELINES = """Current semester: Fall Term
 Current school week: Week 12
 
 Remember:
@@ -1035,6 +1164,16 @@ Remember:
 - Do not make up questions or pretend the user is asking about a coding problem unless they explicitly are.
 """
 
+@lru_cache(maxsize=2)
+def _render_dynamic_context(epoch_second: int) -> str:
+    """Render the dynamic context for one wall-clock second."""
+    stamp = datetime.fromtimestamp(epoch_second).strftime('%Y-%m-%d %H:%M:%S')
+    return f"\nCurrent date: {stamp[:10]}\nCurrent time: {stamp[11:]}\n{DYNAMIC_CONTEXT_GUIDELINES}"
+
+def get_current_dynamic_context() -> str:
+    """Get dynamic context, re-rendered at most once per second."""
+    return _render_dynamic_context(int(time.time()))
+
 # Ultra-optimized content fetching
 async def fetch_subject_content_async(subject_name: str, use_resources: bool = False) -> str:
     """Async version of subject content fetching."""
@@ -1095,7 +1234,7 @@ def fetch_subject_content_by_name(subject_name: str, use_resources: bool = False
             content_cache.set(cache_key, "")
             return ""
         
-        subjects_data = response.json()
+        subjects_data = json_loads(response.content)
         
         # Enhanced subject matching - try multiple strategies
         subject_id = None
@@ -1173,7 +1312,7 @@ def fetch_subject_content(subject_id: str, use_resources: bool = False) -> str:
         logger.debug(f"HTTP request completed in {fetch_time:.2f}s - Status: {response.status_code}")
         
         if response.status_code == 200:
-            content_data = response.json()
+            content_data = json_loads(response.content)
             
             total_resources = content_data.get('totalResources', 0)
             logger.info(f"Subject content received: {total_resources} resources")
@@ -1238,54 +1377,126 @@ def fetch_subject_content(subject_id: str, use_resources: bool = False) -> str:
     content_cache.set(cache_key, "")
     return ""
 
+# Reasoning blocks (including one whose opening tag was consumed by the
+# prompt) and an echoed speaker label, removed in a single scan
+RESPONSE_CLEANUP_PATTERN = re.compile(
+    r'<think>.*?</think>|\A.*?</think>|\A\s*(?:Intel )?Assistant:',
+    re.DOTALL | re.IGNORECASE
+)
+
 def extract_assistant_response(full_text: str) -> str:
-    """Ultra-optimized response extraction."""
+    """Ultra-optimized response extraction from generated (prompt-free) text."""
     if not full_text:
         return "I'm sorry, I couldn't generate a response."
     
-    # Quick pattern matching
-    patterns = [
-        ("Intel Assistant:", 1),
-        ("Assistant:", 1),
-        ("</think>", 1),
-    ]
-    
-    response = full_text
-    for pattern, split_index in patterns:
-        if pattern in response:
-            parts = response.split(pattern, 1)
-            if len(parts) > split_index:
-                response = parts[split_index].strip()
-                break
-    
-    # Quick cleanup
-    import re
-    response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL | re.IGNORECASE)
-    response = response.strip()
+    response = RESPONSE_CLEANUP_PATTERN.sub('', full_text).strip()
     
     if len(response) < 3:
         return "I'm sorry, I couldn't generate a meaningful response."
     
     return response
 
+def read_chat_payload() -> Dict[str, Any]:
+    """Read chat parameters from a JSON or FormData request body."""
+    if request.content_type and 'application/json' in request.content_type:
+        return request.get_json(silent=True) or {}
+    # Handle FormData
+    return request.form.to_dict()
+
+def build_subject_content(request_id: str, user_role: str, use_resources: bool,
+                          chat_subject: str, resource_contents: str) -> str:
+    """Build subject context from uploaded resources or fetch it from the backend."""
+    subject_content = ""
+    if use_resources and user_role == "student":
+        try:
+            # Use provided resource contents if available
+            if resource_contents:
+                try:
+                    resources_data = json_loads(resource_contents)
+                    logger.info(f"📄 [{request_id}] Using provided resource contents: {len(resources_data)} resources")
+                    
+                    # Build context from provided resources
+                    context_parts = [
+                        "\n=== UPLOADED PDF RESOURCES (JSON CONTENT) ===",
+                        f"Total Resources: {len(resources_data)}",
+                        ""
+                    ]
+                    
+                    for resource in resources_data:
+                        context_parts.extend([
+                            f"--- {resource.get('name', 'Unknown')} ---",
+                            f"File: {resource.get('fileName', 'Unknown')}",
+                            f"Pages: {resource.get('pageCount', 'Unknown')}",
+                            f"Words: {resource.get('wordCount', 'Unknown')}",
+                            ""
+                        ])
+                        
+                        # Add extracted text chunks
+                        if resource.get('textChunks'):
+                            for i, chunk in enumerate(resource['textChunks'][:3]):  # Limit to first 3 chunks
+                                content = chunk.get('content', '')[:800]  # Limit chunk size
+                                context_parts.extend([
+                                    f"Chunk {i+1}: {content}",
+                                    ""
+                                ])
+                        elif resource.get('extractedText'):
+                            # Fallback to full extracted text (limited)
+                            extracted = resource['extractedText'][:2000]
+                            context_parts.extend([
+                                f"Content: {extracted}",
+                                ""
+                            ])
+                    
+                    context_parts.append("=== END UPLOADED RESOURCES ===\n")
+                    subject_content = "\n".join(context_parts)
+                    
+                    logger.info(f"[{request_id}] Built context from uploaded JSON resources: {len(subject_content)} chars")
+                    
+                except json.JSONDecodeError as e:
+                    logger.error(f"[{request_id}] Error parsing resource contents JSON: {e}")
+                    subject_content = ""
+            
+            # Only use fallback if no resource contents were provided
+            elif chat_subject and not resource_contents:
+                logger.info(f"[{request_id}] No JSON resource contents provided, falling back to backend fetch")
+                subject_content = fetch_subject_content_by_name(chat_subject, use_resources)
+                if subject_content:
+                    logger.debug(f"[{request_id}] Subject content fetched from backend: {len(subject_content)} chars")
+            else:
+                logger.debug(f"[{request_id}] No resource processing: chat_subject={bool(chat_subject)}, resource_contents={bool(resource_contents)}")
+                    
+        except Exception as e:
+            logger.error(f"[{request_id}] Failed to process subject content: {e}")
+    
+    return subject_content
+
+def build_chat_input(subject: str, subject_content: str, question: str) -> str:
+    """Build the per-request prompt (the role's system prompt is prepended by the model manager)."""
+    base_context = f"{get_current_dynamic_context()}\n\nSubject: {subject}"
+    if subject_content:
+        return f"{base_context}\n\n{subject_content}\n\nUser: {question}\n\nIntel Assistant:"
+    return f"{base_context}\n\nUser: {question}\n\nIntel Assistant:"
+
 # Load model at startup
 if ML_AVAILABLE:
     model_manager.load_model()
 
+# Everything allocated so far (model wrappers, tokenizers, prompt ids) lives
+# for the whole process; move it out of the collector's reach so later
+# collections only walk per-request objects
+gc.collect()
+gc.freeze()
+
 # Flask routes with ultra optimizations
 @app.route("/api/chat", methods=["POST"])
 def ultra_chat():
     """Ultra-optimized chat endpoint with advanced features."""
-    request_id = f"{int(time.time())}-{threading.current_thread().ident}"
+    request_id = f"{next(_request_counter):06x}"
     start_time = time.time()
     
     try:
         # Handle both JSON and FormData requests
-        if request.content_type and 'application/json' in request.content_type:
-            data = request.get_json(silent=True) or {}
-        else:
-            # Handle FormData
-            data = request.form.to_dict()
+        data = read_chat_payload()
         
         # Extract and validate parameters
         question = data.get("question", "").strip()
@@ -1304,9 +1515,9 @@ def ultra_chat():
         
         if not question:
             logger.warning(f"[{request_id}] No question provided")
-            return jsonify({"error": "No question provided"}), 400
+            return json_response({"error": "No question provided"}, 400)
         
-        if user_role not in ["student", "teacher"]:
+        if user_role not in VALID_ROLES:
             logger.warning(f"[{request_id}] Invalid role '{user_role}', defaulting to 'student'")
             user_role = "student"
         
@@ -1315,80 +1526,15 @@ def ultra_chat():
         
         if memory_stats["current_percent"] > 90:
             logger.error(f"[{request_id}] Server overloaded - memory at {memory_stats['current_percent']:.1f}%")
-            return jsonify({"error": "Server temporarily overloaded"}), 503
+            return json_response({"error": "Server temporarily overloaded"}, 503)
         
         # Build subject content from provided resources or fetch if needed
-        subject_content = ""
-        if use_resources and user_role == "student":
-            try:
-                # Use provided resource contents if available
-                if resource_contents:
-                    import json
-                    try:
-                        resources_data = json.loads(resource_contents)
-                        logger.info(f"📄 [{request_id}] Using provided resource contents: {len(resources_data)} resources")
-                        
-                        # Build context from provided resources
-                        context_parts = [
-                            "\n=== UPLOADED PDF RESOURCES (JSON CONTENT) ===",
-                            f"Total Resources: {len(resources_data)}",
-                            ""
-                        ]
-                        
-                        for resource in resources_data:
-                            context_parts.extend([
-                                f"--- {resource.get('name', 'Unknown')} ---",
-                                f"File: {resource.get('fileName', 'Unknown')}",
-                                f"Pages: {resource.get('pageCount', 'Unknown')}",
-                                f"Words: {resource.get('wordCount', 'Unknown')}",
-                                ""
-                            ])
-                            
-                            # Add extracted text chunks
-                            if resource.get('textChunks'):
-                                for i, chunk in enumerate(resource['textChunks'][:3]):  # Limit to first 3 chunks
-                                    content = chunk.get('content', '')[:800]  # Limit chunk size
-                                    context_parts.extend([
-                                        f"Chunk {i+1}: {content}",
-                                        ""
-                                    ])
-                            elif resource.get('extractedText'):
-                                # Fallback to full extracted text (limited)
-                                extracted = resource['extractedText'][:2000]
-                                context_parts.extend([
-                                    f"Content: {extracted}",
-                                    ""
-                                ])
-                        
-                        context_parts.append("=== END UPLOADED RESOURCES ===\n")
-                        subject_content = "\n".join(context_parts)
-                        
-                        logger.info(f"[{request_id}] Built context from uploaded JSON resources: {len(subject_content)} chars")
-                        
-                    except json.JSONDecodeError as e:
-                        logger.error(f"[{request_id}] Error parsing resource contents JSON: {e}")
-                        subject_content = ""
-                
-                # Only use fallback if no resource contents were provided
-                elif chat_subject and not resource_contents:
-                    logger.info(f"[{request_id}] No JSON resource contents provided, falling back to backend fetch")
-                    subject_content = fetch_subject_content_by_name(chat_subject, use_resources)
-                    if subject_content:
-                        logger.debug(f"[{request_id}] Subject content fetched from backend: {len(subject_content)} chars")
-                else:
-                    logger.debug(f"[{request_id}] No resource processing: chat_subject={bool(chat_subject)}, resource_contents={bool(resource_contents)}")
-                        
-            except Exception as e:
-                logger.error(f"[{request_id}] Failed to process subject content: {e}")
-        
-        # Build input context
-        base_context = f"{get_current_dynamic_context()}\n\nSubject: {subject}"
-        if subject_content:
-            input_text = f"{get_system_prompt(user_role)}\n\n{base_context}\n\n{subject_content}\n\nUser: {question}\n\nIntel Assistant:"
-        else:
-            input_text = f"{get_system_prompt(user_role)}\n\n{base_context}\n\nUser: {question}\n\nIntel Assistant:"
+        subject_content = build_subject_content(
+            request_id, user_role, use_resources, chat_subject, resource_contents
+        )
+        input_text = build_chat_input(subject, subject_content, question)
         
-        logger.debug(f"[{request_id}] Input context prepared: {len(input_text)} total chars")
+        logger.debug(f"[{request_id}] Input context prepared: {len(input_text)} chars after system prompt")
         
         # Check model availability
         available_models = len(model_manager.models) if hasattr(model_manager, 'models') else 0
@@ -1399,8 +1545,28 @@ def ultra_chat():
                 logger.info(f"[{request_id}] Starting AI response generation...")
                 generation_start = time.time()
                 
-                # Direct processing for now
-                response = model_manager.generate_response(input_text, user_role)
+                # Concurrent requests of the same role share one model.generate call
+                batched_request = BatchedRequest(
+                    request_id=request_id,
+                    input_text=input_text,
+                    role=user_role,
+                    priority=RequestPriority.NORMAL,
+                    future=Future(),
+                    timestamp=time.time(),
+                    timeout=INFERENCE_TIMEOUT
+                )
+                try:
+                    future = batch_processor.submit_request(batched_request)
+                except queue.Full:
+                    batch_processor.stats["rejected_requests"] += 1
+                    logger.warning(f"[{request_id}] Inference queue full, rejecting request")
+                    return json_response({"error": "Server busy, please retry shortly"}, 503)
+                try:
+                    response = future.result(timeout=batched_request.timeout)
+                except FutureTimeoutError:
+                    future.cancel()
+                    logger.warning(f"[{request_id}] Inference timed out after {batched_request.timeout:.0f}s")
+                    return json_response({"error": "The AI model took too long to respond, please retry"}, 504)
                 answer = extract_assistant_response(response)
                 
                 generation_time = time.time() - generation_start
@@ -1437,7 +1603,7 @@ def ultra_chat():
             }
         }
         
-        return jsonify(response_data)
+        return json_response(response_data)
         
     except Exception as e:
         process_time = round(time.time() - start_time, 3)
@@ -1461,22 +1627,127 @@ def ultra_chat():
         else:
             logger.error(f"[{request_id}] Unexpected error: {e}", extra=error_context)
         
-        return jsonify({
+        return json_response({
             "error": "Server error",
             "message": "Please try again",
             "request_id": request_id,
             "processing_time": process_time
-        }), 500
+        }, 500)
+
+@app.route("/api/chat/stream", methods=["POST"])
+def ultra_chat_stream():
+    """
+    Chat endpoint that streams the answer as Server-Sent Events.
+    
+    Emits {"token": ...} frames while the model generates, then a final
+    {"done": true, "answer": ...} frame with the cleaned-up answer.
+    """
+    request_id = f"{next(_request_counter):06x}"
+    start_time = time.time()
+    
+    data = read_chat_payload()
+    question = data.get("question", "").strip()
+    subject = data.get("subject", "General")
+    user_role = data.get("role", request.headers.get("X-User-Role", "student"))
+    
+    if not question:
+        return json_response({"error": "No question provided"}, 400)
+    
+    if user_role not in VALID_ROLES:
+        user_role = "student"
+    
+    if not model_manager.models:
+        logger.error(f"[{request_id}] No models available")
+        return json_response({"error": "AI model is not available. Please try again later."}, 503)
+    
+    if memory_manager.monitor_memory()["current_percent"] > 90:
+        return json_response({"error": "Server temporarily overloaded"}, 503)
+    
+    if not stream_slots.acquire(blocking=False):
+        logger.warning(f"[{request_id}] Too many active streams, rejecting request")
+        return json_response({"error": "Server busy, please retry shortly"}, 503)
+    
+    try:
+        # Resolve resources while the request context is guaranteed to be active
+        subject_content = build_subject_content(
+            request_id, user_role, data.get("useResources", False),
+            data.get("chatSubject", ""), data.get("resourceContents", "")
+        )
+        input_text = build_chat_input(subject, subject_content, question)
+    except Exception:
+        stream_slots.release()
+        raise
+    logger.info(f"[{request_id}] Streaming chat request started - role: {user_role}")
+    
+    def generate_events():
+        generated = []
+        pending = ""  # Text held back while the model may still be reasoning
+        answering = False
+        try:
+            for text in model_manager.stream_response(input_text, user_role):
+                generated.append(text)
+                if answering:
+                    yield sse_event({"token": text})
+                    continue
+                
+                # Withhold a leading <think>...</think> block so clients only
+                # receive answer tokens, starting as soon as the block closes
+                pending += text
+                head = pending.lstrip()
+                if not head:
+                    continue
+                if head.startswith("<think>") or "<think>".startswith(head):
+                    # Only the newest text can complete the closing tag
+                    if "</think>" not in pending[-(len(text) + 8):]:
+                        continue
+                    pending = pending.partition("</think>")[2]
+                answering = True
+                pending = pending.lstrip()
+                if pending:
+                    yield sse_event({"token": pending})
+            
+            answer = extract_assistant_response("".join(generated))
+            process_time = round(time.time() - start_time, 3)
+            logger.info(f"[{request_id}] Streaming chat completed in {process_time}s")
+            yield sse_event({
+                "done": True,
+                "answer": answer,
+                "latency": process_time,
+                "metadata": {"request_id": request_id}
+            })
+        except TimeoutError as e:
+            logger.warning(f"[{request_id}] Streaming timed out: {e}")
+            yield sse_event({"error": "Timeout", "message": "The AI model took too long to respond, please retry", "request_id": request_id})
+        except Exception as e:
+            logger.error(f"[{request_id}] Streaming error: {e}", exc_info=True)
+            yield sse_event({"error": "Server error", "message": "Please try again", "request_id": request_id})
+    
+    response = app.response_class(
+        stream_with_context(generate_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # The WSGI server closes the response even if the stream never started
+    response.call_on_close(stream_slots.release)
+    return response
 
 @app.route("/api/query", methods=["POST"])
 def ultra_query():
     """Compatibility endpoint."""
     return ultra_chat()
 
+def warmup_status() -> str:
+    """Summarize background model warm-up for health checks."""
+    if model_manager.warmup_failed:
+        return "failed"
+    if model_manager.warm_models:
+        return "complete"
+    return "pending"
+
 @app.route("/api/health", methods=["GET"])
 def ultra_health():
     """Ultra-comprehensive health check."""
-    request_id = f"health-{int(time.time())}"
+    request_id = f"health-{next(_request_counter):06x}"
     
     try:
         logger.debug(f"[{request_id}] Health check requested")
@@ -1492,6 +1763,7 @@ def ultra_health():
             "components": {
                 "server": "up",
                 "llm": "up" if model_available else "down",
+                "llm_warmup": warmup_status(),
                 "cache": "up",
                 "memory_manager": "up"
             },
@@ -1510,22 +1782,22 @@ def ultra_health():
             logger.warning(f"[{request_id}] Service degraded - high memory usage: {memory_stats['current_percent']:.1f}%")
         
         logger.debug(f"[{request_id}] Health check completed - status: {status['status']}")
-        return jsonify(status)
+        return json_response(status)
         
     except Exception as e:
         logger.error(f"[{request_id}] Health check failed: {e}", exc_info=True)
-        return jsonify({
+        return json_response({
             "status": "unhealthy",
             "error": str(e),
             "timestamp": datetime.now().isoformat(),
             "request_id": request_id
-        }), 500
+        }, 500)
 
 @app.route("/api/stats", methods=["GET"])
 def ultra_stats():
     """Detailed performance statistics."""
     try:
-        return jsonify({
+        return json_response({
             "server": {
                 "uptime": time.time() - start_time if 'start_time' in globals() else 0,
                 "threads": threading.active_count(),
@@ -1542,7 +1814,7 @@ def ultra_stats():
             }
         })
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 # Graceful shutdown handling
 def shutdown_handler(signum, frame):
@@ -1562,12 +1834,14 @@ def shutdown_handler(signum, frame):
     logger.info("Shutdown complete")
     sys.exit(0)
 
-# Register shutdown handlers
-signal.signal(signal.SIGINT, shutdown_handler)
-signal.signal(signal.SIGTERM, shutdown_handler)
 atexit.register(lambda: logger.info("Server shutdown"))
 
 if __name__ == "__main__":
+    # Only install signal handlers when running standalone; an external
+    # WSGI server (e.g. gunicorn importing `app`) manages its own signals
+    signal.signal(signal.SIGINT, shutdown_handler)
+    signal.signal(signal.SIGTERM, shutdown_handler)
+    
     start_time = time.time()
     
     # Basic startup logging
@@ -1611,15 +1885,20 @@ if __name__ == "__main__":
         logger.info("Server startup completed - ready to accept requests")
         
         try:
-            # Run with optimizations
-            app.run(
-                debug=False,
-                port=port,
-                host=host,
-                threaded=True,
-                use_reloader=False,
-                processes=1  # Use threading instead of multiprocessing
-            )
+            if WAITRESS_AVAILABLE:
+                # Single process (one copy of the model), threads overlap request I/O
+                logger.info(f"Serving with waitress ({MAX_WORKERS} threads)")
+                waitress_serve(app, host=host, port=port, threads=MAX_WORKERS)
+            else:
+                logger.warning("waitress not installed, falling back to the Werkzeug server")
+                app.run(
+                    debug=False,
+                    port=port,
+                    host=host,
+                    threaded=True,
+                    use_reloader=False,
+                    processes=1  # Use threading instead of multiprocessing
+                )
         except KeyboardInterrupt:
             logger.info("Server shutdown requested by user")
         except Exception as e:
@@ -1,9 +1,15 @@
 from flask import Flask, request, jsonify
 import os
-import wave
+import json
 import subprocess
 from vosk import Model, KaldiRecognizer
 from flask_cors import CORS
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 app = Flask(__name__)
 CORS(app)   
 model_path = model_path = "C:/Users/arsha/OneDrive - Manipal Academy of Higher Education/Documents/Intel_Assistant/vosk-model-small-en-us-0.15"
@@ -25,36 +31,38 @@ def transcribe():
 
     audio_file = request.files['audio']
     audio_path = "temp_audio.webm"
-    wav_path = "temp_audio.wav"
     audio_file.save(audio_path)
 
-    # Convert webm to wav using ffmpeg
-    subprocess.run([
-        "ffmpeg", "-i", audio_path, "-ar", "16000", "-ac", "1", "-f", "wav", wav_path
-    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-    wf = wave.open(wav_path, "rb")
-    rec = KaldiRecognizer(model, wf.getframerate())
-
-    text = ""
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            text += rec.Result()
-    text += rec.FinalResult()
+    # Decode webm straight to 16 kHz mono PCM on ffmpeg's stdout; reads block
+    # until audio is available, with no intermediate wav file to write and re-read
+    proc = subprocess.Popen([
+        "ffmpeg", "-i", audio_path, "-ar", "16000", "-ac", "1", "-f", "s16le", "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    rec = KaldiRecognizer(model, 16000)
 
-    os.remove(audio_path)
-    os.remove(wav_path)
-
-    # Extract final recognized text
-    import json
+    # Parse each finalized segment once as it is produced
+    segments = []
     try:
-        result_json = json.loads(text.split('\n')[-1])
-        return jsonify({"text": result_json.get("text", "")})
-    except:
+        while True:
+            data = proc.stdout.read(8000)  # 4000 16-bit samples
+            if len(data) == 0:
+                break
+            if rec.AcceptWaveform(data):
+                segments.append(json_loads(rec.Result()).get("text", ""))
+        segments.append(json_loads(rec.FinalResult()).get("text", ""))
+    except ValueError:
         return jsonify({"error": "Failed to parse result"})
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        os.remove(audio_path)
+
+    # A corrupt or undecodable upload just yields an empty pipe; report it
+    # instead of returning an empty transcript
+    if returncode != 0:
+        return jsonify({"error": "Failed to decode audio"}), 400
+
+    return jsonify({"text": " ".join(s for s in segments if s)})
 
 if __name__ == '__main__':
     app.run(port=5000)
@@ -0,0 +1,52 @@
+"""Tests for the chat request batch queue."""
+
+import os
+import sys
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "servers"))
+
+from request_batching import BatchedRequest, IntelligentBatchProcessor, RequestPriority  # noqa: E402
+
+
+def make_request(request_id, timestamp):
+    return BatchedRequest(
+        request_id=request_id,
+        input_text="What is photosynthesis?",
+        role="student",
+        priority=RequestPriority.NORMAL,
+        future=Future(),
+        timestamp=timestamp,
+        timeout=1.0,
+    )
+
+
+def test_same_priority_and_timestamp_queue_in_submission_order():
+    processor = IntelligentBatchProcessor(
+        lambda input_texts, role: [""] * len(input_texts),
+        batch_size=4,
+        timeout=0.01,
+        max_queued=4,
+    )
+    processor.processing = True  # Keep the worker thread out of the test
+
+    first = make_request("a", 1000.0)
+    second = make_request("b", 1000.0)
+    processor.submit_request(first)
+    processor.submit_request(second)  # Raised TypeError when the tuple compared the dataclasses
+
+    assert processor._collect_batch(idle_timeout=0.1) == [first, second]
+
+
+def test_batch_results_resolve_each_future():
+    processor = IntelligentBatchProcessor(
+        lambda input_texts, role: [f"{role}:{text}" for text in input_texts],
+        batch_size=4,
+        timeout=0.01,
+        max_queued=4,
+    )
+    requests = [make_request(str(i), 1000.0) for i in range(2)]
+
+    processor._process_batch(requests)
+
+    assert [req.future.result(timeout=1) for req in requests] == ["student:What is photosynthesis?"] * 2